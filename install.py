@@ -1,157 +1,330 @@
 import os
 import sys
+import copy
+import importlib.util
+import ipaddress
 import subprocess
+import random
+import re
+import shutil
 import signal
 import socket
+import tarfile
+import tempfile
 import time
 import threading
 from datetime import datetime
-import termcolor
-import requests
-import yaml
-from tqdm import tqdm
+
+# requests, yaml and tqdm are imported where they are used, so commands that do not
+# need them start faster and check_and_install_modules() can run first
+
+# orjson is optional; the stdlib parser is the fallback
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+# ANSI colours, disabled when output is piped or NO_COLOR is set
+USE_COLOR = sys.stdout.isatty() and "NO_COLOR" not in os.environ
+COLORS = {"red": "\033[31m", "green": "\033[32m", "yellow": "\033[33m"}
+RESET = "\033[0m"
+
+def colored(text, color):
+    if not USE_COLOR:
+        return text
+    return f"{COLORS[color]}{text}{RESET}"
 
 # Global Configuration
 CONFIG_DIR = "/etc/traefik/"
 CONFIG_FILE = os.path.join(CONFIG_DIR, "traefik.yml")
 DYNAMIC_FILE = os.path.join(CONFIG_DIR, "dynamic.yml")
 SERVICE_FILE = "/etc/systemd/system/traefik-tunnel.service"
+TRAEFIK_BIN = "/usr/local/bin/traefik"
+TRAEFIK_URL = "https://github.com/traefik/traefik/releases/download/v3.1.0/traefik_v3.1.0_linux_amd64.tar.gz"
 RETRY_ATTEMPTS = 3
 RETRY_DELAY = 5
 KEEPALIVE_INTERVAL = 30
+SERVER_IP_CACHE = "/run/traefik-tunnel/server_ip"
+SERVER_IP_CACHE_TTL = 3600
+
+# filename -> (st_mtime_ns, st_size, parsed config) for the last load or save
+_YAML_CACHE = {}
+
+# systemd unit for the tunnel service; {api_port} is filled in by _setup_service
+SERVICE_TEMPLATE = """[Unit]
+Description=Traefik Tunnel Service
+After=network.target
+
+[Service]
+Type=simple
+ExecStart=/usr/local/bin/traefik \\
+    --configfile=/etc/traefik/traefik.yml \\
+    --api.dashboard=true \\
+    --api.insecure=true \\
+    --entrypoints.traefik.address=0.0.0.0:{api_port} \\
+    --log.level=DEBUG
+Restart=always
+RestartSec=5
+StartLimitInterval=0
+User=root
+
+[Install]
+WantedBy=multi-user.target"""
 
 def run_command(command):
-    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    stdout, stderr = process.communicate()
-    if process.returncode != 0:
-        print(termcolor.colored(f"Error: {stderr}", "red"))
-    return process.returncode
+    # Only stderr is ever reported, so stdout is discarded rather than piped
+    result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        print(colored(f"Error: {result.stderr}", "red"))
+    return result.returncode
+
+def atomic_write(path, data):
+    """Write data to path via a synced temporary sibling so readers never see a partial file."""
+    # A unique temp name keeps concurrent runs from sharing one file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(data)
+            f.flush()
+            # mkstemp creates 0600; keep the mode of the file being replaced
+            try:
+                os.fchmod(f.fileno(), os.stat(path).st_mode & 0o7777)
+            except FileNotFoundError:
+                os.fchmod(f.fileno(), 0o644)
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
 
-def check_and_install_modules():
-    modules = ["tqdm", "termcolor", "requests", "pyyaml"]
+def write_if_changed(path, data):
+    """Atomically write data to path unless the file already holds it. Returns True if written."""
     try:
-        import pkg_resources
-        installed = {pkg.key for pkg in pkg_resources.working_set}
-        for module in modules:
-            if module not in installed:
-                run_command([sys.executable, "-m", "pip", "install", module])
-    except Exception:
-        run_command(["sudo", "apt", "update"])
-        run_command(["sudo", "apt", "install", "-y", "python3-pip"])
-        for module in modules:
-            run_command([sys.executable, "-m", "pip", "install", module])
+        with open(path, "r") as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    atomic_write(path, data)
+    return True
+
+def check_and_install_modules():
+    # Images with the dependencies baked in can opt out of the check entirely
+    if os.environ.get("AS_TUNNEL_SKIP_BOOTSTRAP") == "1":
+        return
+
+    # pip package name -> importable module name
+    modules = {"tqdm": "tqdm", "requests": "requests", "pyyaml": "yaml"}
+    # find_spec only locates the modules, so nothing is imported when all are present
+    missing = [package for package, module in modules.items()
+               if importlib.util.find_spec(module) is None]
+    if not missing:
+        return
+
+    if importlib.util.find_spec("pip") is None:
+        # One sudo invocation for both apt steps
+        run_command(["sudo", "sh", "-c", "apt update && apt install -y python3-pip"])
+    run_command([sys.executable, "-m", "pip", "install",
+                 "--disable-pip-version-check", "--no-input", *missing])
 
 class TunnelManager:
+    _server_ip = None
+    _TUNNEL_TMPL = "\n  Port: {port}\n  Status: {status}\n  Backend: {backend}\n  Local Address: {local_address}\n"
+    _TUNNEL_DEFAULTS = {"port": "unknown", "status": "unknown", "backend": "unknown", "local_address": "unknown"}
+
     def __init__(self, api_port):
         self.api_port = api_port
         self.running = False
         self.monitor_thread = None
+        self._stop_event = threading.Event()
         self.last_error = None
         self.tunnels = {}
-        self.server_ip = self._get_server_ip()
+        self._session = None
+        self._service_pid = None
+        # Numeric loopback address: no resolver lookup, and Traefik listens on 0.0.0.0
+        self._routers_url = f"http://127.0.0.1:{api_port}/api/tcp/routers"
+        self._ping_url = f"http://127.0.0.1:{api_port}/ping"
         self._setup_signal_handlers()
 
+    @property
+    def server_ip(self):
+        """The server's IP, looked up on first use and shared by all instances."""
+        if TunnelManager._server_ip is None:
+            TunnelManager._server_ip = self._get_server_ip()
+        return TunnelManager._server_ip
+
     def _get_server_ip(self):
+        # /run is a tmpfs, so the cached address never outlives a reboot
+        try:
+            if time.time() - os.stat(SERVER_IP_CACHE).st_mtime < SERVER_IP_CACHE_TTL:
+                with open(SERVER_IP_CACHE) as f:
+                    cached_ip = f.read().strip()
+                if cached_ip:
+                    return cached_ip
+        except OSError:
+            pass
         try:
-            cmd = "curl -s http://ipv4.icanhazip.com"
-            public_ip = subprocess.check_output(cmd, shell=True).decode('utf-8').strip()
-            if public_ip:
-                return public_ip
-        except:
+            public_ip = self._get_session().get("http://ipv4.icanhazip.com", timeout=2).text.strip()
+            ipaddress.ip_address(public_ip)
+        except Exception:
+            public_ip = None
+        if public_ip:
             try:
-                cmd = "hostname -I | cut -d' ' -f1"
-                local_ip = subprocess.check_output(cmd, shell=True).decode('utf-8').strip()
-                return local_ip
-            except:
-                return '0.0.0.0'
+                os.makedirs(os.path.dirname(SERVER_IP_CACHE), exist_ok=True)
+                atomic_write(SERVER_IP_CACHE, public_ip + "\n")
+            except OSError:
+                pass  # not root; just skip caching
+            return public_ip
+        # Fall back to the address of the outbound interface; connecting a UDP
+        # socket only selects a route and sends no packets
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                sock.connect(("1.1.1.1", 80))
+                return sock.getsockname()[0]
+        except OSError:
+            return '0.0.0.0'
+
+    def _get_session(self):
+        """Return the shared HTTP session, creating it on first use so keep-alive connections are reused."""
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            self._session = requests.Session()
+            self._session.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=2))
+        return self._session
 
     def _setup_signal_handlers(self):
         signal.signal(signal.SIGINT, self._signal_handler)
         signal.signal(signal.SIGTERM, self._signal_handler)
 
     def _signal_handler(self, signum, frame):
-        print(termcolor.colored("\nReceived shutdown signal. Cleaning up...", "yellow"))
+        print(colored("\nReceived shutdown signal. Cleaning up...", "yellow"))
         self.stop_monitoring()
         sys.exit(0)
 
     def _check_requirements(self):
-        try:
-            subprocess.run(["which", "traefik"], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        except subprocess.CalledProcessError:
-            print(termcolor.colored("Traefik is not installed. Installing Traefik...", "yellow"))
-            run_command(["curl", "-L", "https://github.com/traefik/traefik/releases/download/v3.1.0/traefik_v3.1.0_linux_amd64.tar.gz", "-o", "traefik.tar.gz"])
-            run_command(["tar", "-xzf", "traefik.tar.gz"])
-            run_command(["sudo", "mv", "traefik", "/usr/local/bin/"])
-            run_command(["sudo", "chmod", "+x", "/usr/local/bin/traefik"])
-            os.remove("traefik.tar.gz")
+        if shutil.which("traefik") is None:
+            print(colored("Traefik is not installed. Installing Traefik...", "yellow"))
+            self._install_traefik()
+
+    def _install_traefik(self):
+        """Stream the Traefik release archive and extract the binary in one pass."""
+        from tqdm import tqdm
+        with self._get_session().get(TRAEFIK_URL, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            total = int(response.headers.get("Content-Length", 0)) or None
+            # Unpack into a sibling temp file so a dropped download never leaves a
+            # truncated binary at TRAEFIK_BIN
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(TRAEFIK_BIN), prefix="traefik.")
+            try:
+                with os.fdopen(fd, "wb") as out, \
+                        tqdm.wrapattr(response.raw, "read", total=total, desc="Downloading Traefik") as raw, \
+                        tarfile.open(fileobj=raw, mode="r|gz") as archive:
+                    for member in archive:
+                        if member.name == "traefik" and member.isfile():
+                            shutil.copyfileobj(archive.extractfile(member), out)
+                            break
+                    else:
+                        raise Exception("Traefik binary not found in release archive")
+                    out.flush()
+                    os.fsync(out.fileno())
+                os.chmod(tmp_path, 0o755)
+                os.replace(tmp_path, TRAEFIK_BIN)
+            except BaseException:
+                try:
+                    os.unlink(tmp_path)
+                except FileNotFoundError:
+                    pass
+                raise
 
     def start_monitoring(self):
         self.running = True
+        self._stop_event.clear()
         self.monitor_thread = threading.Thread(target=self._monitor_tunnels)
         self.monitor_thread.daemon = True
         self.monitor_thread.start()
-        print(termcolor.colored("Tunnel monitoring started", "green"))
+        print(colored("Tunnel monitoring started", "green"))
 
     def stop_monitoring(self):
         self.running = False
+        self._stop_event.set()
         if self.monitor_thread:
-            self.monitor_thread.join()
-        print(termcolor.colored("Tunnel monitoring stopped", "yellow"))
+            self.monitor_thread.join(timeout=2)
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+        print(colored("Tunnel monitoring stopped", "yellow"))
 
     def _monitor_tunnels(self):
-        while self.running:
+        while not self._stop_event.is_set():
             try:
                 self._check_service_health()
-                time.sleep(KEEPALIVE_INTERVAL)
             except Exception as e:
                 self.last_error = str(e)
-                print(termcolor.colored(f"Error detected: {self.last_error}", "red"))
+                print(colored(f"Error detected: {self.last_error}", "red"))
+                # A failed probe means the cached PID can no longer be trusted
+                self._service_pid = None
                 self._attempt_recovery()
+            # Returns early as soon as stop_monitoring() sets the event
+            if self._stop_event.wait(KEEPALIVE_INTERVAL):
+                return
 
     def _check_service_health(self):
         try:
-            print(termcolor.colored("Checking service health...", "yellow"))
+            print(colored("Checking service health...", "yellow"))
             
             # First, check service status
-            result = subprocess.run(["systemctl", "is-active", "traefik-tunnel.service"],
-                                 capture_output=True, text=True)
-            
-            if result.stdout.strip() != "active":
-                print(termcolor.colored("Service is not active. Checking logs...", "yellow"))
+            if not self._is_service_active():
+                print(colored("Service is not active. Checking logs...", "yellow"))
                 logs = subprocess.run(["journalctl", "-u", "traefik-tunnel.service", "-n", "50"],
                                     capture_output=True, text=True)
                 print(logs.stdout)
                 
-                print(termcolor.colored("Attempting to restart service...", "yellow"))
+                print(colored("Attempting to restart service...", "yellow"))
                 subprocess.run(["sudo", "systemctl", "restart", "traefik-tunnel.service"])
                 time.sleep(10)
                 
-            # Try to connect to API
-            print(termcolor.colored(f"Checking API connection on port {self.api_port}...", "yellow"))
-            api_urls = [
-                f"http://127.0.0.1:{self.api_port}/api/rawdata",
-                f"http://localhost:{self.api_port}/api/rawdata",
-                f"http://0.0.0.0:{self.api_port}/api/rawdata"
-            ]
-            
-            connected = False
-            for url in api_urls:
-                try:
-                    response = requests.get(url, timeout=5)
-                    if response.status_code == 200:
-                        print(termcolor.colored(f"Successfully connected to API at {url}", "green"))
-                        connected = True
-                        break
-                except:
-                    continue
-                    
-            if not connected:
+            # Liveness only needs /ping; get_status fetches the router data
+            print(colored(f"Checking API connection on port {self.api_port}...", "yellow"))
+            try:
+                response = self._get_session().head(self._ping_url, timeout=2)
+            except Exception:
                 raise Exception("Could not connect to Traefik API")
+            # Configs from before ping was enabled answer 404 there until the next
+            # install adds it, so for those only reachability can be checked
+            # HEAD does not follow redirects, so response.ok would let a 3xx through
+            if "ping" in (self._load_config(CONFIG_FILE) or {}) and not 200 <= response.status_code < 300:
+                raise Exception(f"Traefik ping returned HTTP {response.status_code}")
+            print(colored(f"Successfully connected to API on port {self.api_port}", "green"))
 
         except Exception as e:
-            print(termcolor.colored(f"Service health check failed: {str(e)}", "red"))
+            print(colored(f"Service health check failed: {str(e)}", "red"))
             raise
 
+    def _is_service_active(self):
+        """Check the service is running, asking systemd only when the cached main PID is gone."""
+        if self._service_pid:
+            try:
+                with open(f"/proc/{self._service_pid}/comm") as f:
+                    if f.read().strip() == "traefik":
+                        return True
+            except OSError:
+                pass
+            self._service_pid = None
+
+        result = subprocess.run(["systemctl", "show", "-p", "ActiveState", "-p", "MainPID",
+                                 "traefik-tunnel.service"], capture_output=True, text=True)
+        props = dict(line.split("=", 1) for line in result.stdout.splitlines() if "=" in line)
+        if props.get("ActiveState") != "active":
+            return False
+        if props.get("MainPID", "0") != "0":
+            self._service_pid = props["MainPID"]
+        return True
+
     def _get_default_traefik_config(self):
         return {
             "entryPoints": {
@@ -163,6 +336,7 @@ class TunnelManager:
                 "dashboard": True,
                 "insecure": True
             },
+            "ping": {},
             "providers": {
                 "file": {
                     "filename": DYNAMIC_FILE
@@ -176,43 +350,16 @@ class TunnelManager:
         }
 
     def _setup_service(self):
-        service_content = f"""[Unit]
-Description=Traefik Tunnel Service
-After=network.target
-
-[Service]
-Type=simple
-ExecStart=/usr/local/bin/traefik \\
-    --configfile=/etc/traefik/traefik.yml \\
-    --api.dashboard=true \\
-    --api.insecure=true \\
-    --entrypoints.traefik.address=0.0.0.0:{self.api_port} \\
-    --log.level=DEBUG
-Restart=always
-RestartSec=5
-StartLimitInterval=0
-User=root
-
-[Install]
-WantedBy=multi-user.target"""
-
         os.makedirs(CONFIG_DIR, exist_ok=True)
-        with open(SERVICE_FILE, "w") as f:
-            f.write(service_content)
-
-        subprocess.run(["sudo", "systemctl", "daemon-reload"], check=True)
-        subprocess.run(["sudo", "systemctl", "enable", "traefik-tunnel.service"], check=True)
-        
-        # Stop service if running
-        try:
-            subprocess.run(["sudo", "systemctl", "stop", "traefik-tunnel.service"], check=True)
-            time.sleep(2)
-        except:
-            pass
-            
-        # Start service
-        print(termcolor.colored("Starting Traefik service...", "yellow"))
-        subprocess.run(["sudo", "systemctl", "start", "traefik-tunnel.service"], check=True)
+        unit_changed = write_if_changed(SERVICE_FILE, SERVICE_TEMPLATE.format(api_port=self.api_port))
+
+        # Enable and (re)start the service in a single sudo call, reloading
+        # systemd only when the unit file actually changed
+        steps = ["systemctl enable traefik-tunnel.service", "systemctl restart traefik-tunnel.service"]
+        if unit_changed:
+            steps.insert(0, "systemctl daemon-reload")
+        print(colored("Starting Traefik service...", "yellow"))
+        subprocess.run(["sudo", "sh", "-c", " && ".join(steps)], check=True)
         time.sleep(5)
         
         # Check service status
@@ -223,28 +370,36 @@ WantedBy=multi-user.target"""
     def _attempt_recovery(self):
         for attempt in range(RETRY_ATTEMPTS):
             try:
-                print(termcolor.colored(f"Recovery attempt {attempt + 1}/{RETRY_ATTEMPTS}...", "yellow"))
+                print(colored(f"Recovery attempt {attempt + 1}/{RETRY_ATTEMPTS}...", "yellow"))
                 subprocess.run(["sudo", "systemctl", "restart", "traefik-tunnel.service"], check=True)
-                time.sleep(RETRY_DELAY)
+                # Give Traefik a moment to bind before probing it
+                if self._stop_event.wait(RETRY_DELAY):
+                    return
                 self._check_service_health()
-                print(termcolor.colored("Service recovered successfully", "green"))
+                print(colored("Service recovered successfully", "green"))
                 return
             except Exception as e:
                 if attempt == RETRY_ATTEMPTS - 1:
-                    print(termcolor.colored(f"Failed to recover service after {RETRY_ATTEMPTS} attempts", "red"))
+                    print(colored(f"Failed to recover service after {RETRY_ATTEMPTS} attempts", "red"))
+                    return
+                # Back off exponentially (with jitter) so a persistent fault does
+                # not turn into a systemd restart storm
+                delay = min(RETRY_DELAY * (2 ** attempt), 60) + random.random()
+                if self._stop_event.wait(delay):
+                    return
 
     def install_tunnel(self, ip_version, ip_backend, ports):
         """Install and configure a new tunnel."""
         try:
-            self._validate_inputs(ip_version, ip_backend, ports)
+            port_nums = self._validate_inputs(ip_version, ip_backend, ports)
             self._check_requirements()
-            self._create_configs(ip_backend, ports)
+            self._create_configs(ip_backend, port_nums)
             self._setup_service()
             self.start_monitoring()
-            print(termcolor.colored("Tunnel installed successfully!", "green"))
+            print(colored("Tunnel installed successfully!", "green"))
             return True
         except Exception as e:
-            print(termcolor.colored(f"Installation failed: {str(e)}", "red"))
+            print(colored(f"Installation failed: {str(e)}", "red"))
             return False
 
     def delete_tunnel(self, ports_to_delete):
@@ -254,10 +409,11 @@ WantedBy=multi-user.target"""
             dynamic_config = self._load_config(DYNAMIC_FILE)
 
             if not traefik_config or not dynamic_config:
-                print(termcolor.colored("No tunnel configuration found.", "red"))
+                print(colored("No tunnel configuration found.", "red"))
                 return False
 
-            for port in ports_to_delete:
+            # Same parsing as install, so "080" finds the port_80 it created
+            for port in map(self._parse_port, ports_to_delete):
                 entry_point = f"port_{port}"
                 if "entryPoints" in traefik_config and entry_point in traefik_config["entryPoints"]:
                     del traefik_config["entryPoints"][entry_point]
@@ -270,23 +426,25 @@ WantedBy=multi-user.target"""
                 if service_name in dynamic_config["tcp"]["services"]:
                     del dynamic_config["tcp"]["services"][service_name]
 
-            self._save_config(CONFIG_FILE, traefik_config)
-            self._save_config(DYNAMIC_FILE, dynamic_config)
+            traefik_changed = self._save_config(CONFIG_FILE, traefik_config)
+            dynamic_changed = self._save_config(DYNAMIC_FILE, dynamic_config)
+            if not (traefik_changed or dynamic_changed):
+                print(colored("\nNo matching tunnels found; nothing to delete.", "yellow"))
+                return True
 
             subprocess.run(["sudo", "systemctl", "restart", "traefik-tunnel.service"], check=True)
-            print(termcolor.colored("\nSelected tunnels have been deleted successfully.", "green"))
+            print(colored("\nSelected tunnels have been deleted successfully.", "green"))
             return True
 
         except Exception as e:
-            print(termcolor.colored(f"Error deleting tunnels: {str(e)}", "red"))
+            print(colored(f"Error deleting tunnels: {str(e)}", "red"))
             return False
 
     def uninstall(self):
         """Uninstall the Traefik Tunnel Manager and remove all configurations."""
         try:
-            print(termcolor.colored("Stopping Traefik service...", "yellow"))
-            subprocess.run(["sudo", "systemctl", "stop", "traefik-tunnel.service"], check=True)
-            subprocess.run(["sudo", "systemctl", "disable", "traefik-tunnel.service"], check=True)
+            print(colored("Stopping Traefik service...", "yellow"))
+            subprocess.run(["sudo", "systemctl", "disable", "--now", "traefik-tunnel.service"], check=True)
 
             files_to_remove = [
                 SERVICE_FILE,
@@ -295,54 +453,122 @@ WantedBy=multi-user.target"""
             ]
 
             for file in files_to_remove:
-                if os.path.exists(file):
-                    os.remove(file)
-                    print(termcolor.colored(f"Removed {file}", "yellow"))
+                try:
+                    os.unlink(file)
+                    print(colored(f"Removed {file}", "yellow"))
+                except FileNotFoundError:
+                    pass
 
-            if os.path.exists(CONFIG_DIR) and not os.listdir(CONFIG_DIR):
-                os.rmdir(CONFIG_DIR)
+            try:
+                with os.scandir(CONFIG_DIR) as entries:
+                    config_dir_empty = next(entries, None) is None
+                if config_dir_empty:
+                    os.rmdir(CONFIG_DIR)
+            except FileNotFoundError:
+                pass
 
             if input("Remove Traefik binary? (y/N): ").lower() == 'y':
-                if os.path.exists("/usr/local/bin/traefik"):
-                    subprocess.run(["sudo", "rm", "/usr/local/bin/traefik"], check=True)
-                    print(termcolor.colored("Removed Traefik binary", "yellow"))
+                if os.path.exists(TRAEFIK_BIN):
+                    subprocess.run(["sudo", "rm", TRAEFIK_BIN], check=True)
+                    print(colored("Removed Traefik binary", "yellow"))
 
             subprocess.run(["sudo", "systemctl", "daemon-reload"], check=True)
-            print(termcolor.colored("\nTraefik Tunnel Manager has been completely uninstalled.", "green"))
+            print(colored("\nTraefik Tunnel Manager has been completely uninstalled.", "green"))
             return True
 
         except Exception as e:
-            print(termcolor.colored(f"Error during uninstallation: {str(e)}", "red"))
+            print(colored(f"Error during uninstallation: {str(e)}", "red"))
             return False
 
     def _validate_inputs(self, ip_version, ip_backend, ports):
-        """Validate user inputs for IP version, backend IP, and ports."""
+        """Validate user inputs for IP version, backend IP, and ports.
+
+        Returns the ports as ints, which the config keys are built from.
+        """
         if ip_version not in ['4', '6']:
             raise ValueError("Invalid IP version")
             
         try:
-            socket.inet_pton(socket.AF_INET if ip_version == '4' else socket.AF_INET6, ip_backend)
-        except socket.error:
+            backend_address = ipaddress.ip_address(ip_backend)
+        except ValueError:
+            raise ValueError(f"Invalid IPv{ip_version} address format")
+        if backend_address.version != int(ip_version):
             raise ValueError(f"Invalid IPv{ip_version} address format")
 
+        configured_ports = self._get_configured_ports()
+        port_nums = []
         for port in ports:
-            try:
-                port_num = int(port)
-                if not 1 <= port_num <= 65535:
-                    raise ValueError(f"Port {port} out of valid range (1-65535)")
-                if not self._check_port_available(port_num):
-                    raise ValueError(f"Port {port} is already in use")
-            except ValueError as e:
-                raise ValueError(f"Invalid port number: {str(e)}")
-
-    def _check_port_available(self, port):
-        """Check if a port is available for binding."""
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-            try:
-                sock.bind(('0.0.0.0', port))
-                return True
-            except socket.error:
-                return False
+            port_num = self._parse_port(port)
+            if port_num in configured_ports:
+                raise ValueError(f"Invalid port number: Port {port} is already configured as a tunnel")
+            if port_num in port_nums:
+                raise ValueError(f"Invalid port number: Port {port} is listed more than once")
+            port_nums.append(port_num)
+
+        for port_num, available in self._check_ports_available(port_nums).items():
+            if not available:
+                raise ValueError(f"Invalid port number: Port {port_num} is already in use")
+        return port_nums
+
+    def _parse_port(self, port):
+        """Parse a user-supplied port into an int, raising ValueError if it is not a valid port."""
+        port = str(port)
+        # ASCII only: isdigit() also accepts digits like "²" or "۸۰"
+        if not re.fullmatch(r"[0-9]+", port):
+            raise ValueError(f"Invalid port number: {port}")
+        port_num = int(port)
+        if not 1 <= port_num <= 65535:
+            raise ValueError(f"Invalid port number: Port {port} out of valid range (1-65535)")
+        return port_num
+
+    def _get_configured_ports(self):
+        """Return the set of frontend ports that already have a tunnel entry point."""
+        traefik_config = self._load_config(CONFIG_FILE) or {}
+        ports = set()
+        for entry_name in traefik_config.get("entryPoints", {}):
+            # Same ASCII-only check as _parse_port; a hand-edited "port_²" must not reach int()
+            if entry_name.startswith("port_") and re.fullmatch(r"[0-9]+", entry_name[len("port_"):]):
+                ports.add(int(entry_name[len("port_"):]))
+        return ports
+
+    def _listening_ports(self):
+        """Return the set of local TCP ports in LISTEN state, or None if /proc/net/tcp is unreadable."""
+        try:
+            with open("/proc/net/tcp", "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            with open("/proc/net/tcp6", "rb") as f:
+                data += f.read()
+        except OSError:
+            pass  # IPv6 disabled
+
+        listening = set()
+        for line in data.splitlines():
+            fields = line.split()
+            # fields[1] is local_address as HEXIP:HEXPORT, fields[3] the state (0A = LISTEN)
+            if len(fields) > 3 and fields[3] == b"0A":
+                listening.add(int(fields[1].rsplit(b":", 1)[1], 16))
+        return listening
+
+    def _check_ports_available(self, ports):
+        """Check which ports are available for binding, returning a {port: bool} map."""
+        listening = self._listening_ports()
+        if listening is not None:
+            return {port: port not in listening for port in ports}
+
+        results = {}
+        for port in ports:
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+                # Ignore TIME_WAIT leftovers; an active listener still fails the bind
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                try:
+                    sock.bind(('0.0.0.0', port))
+                    results[port] = True
+                except socket.error:
+                    results[port] = False
+        return results
 
     def _create_configs(self, ip_backend, ports):
         """Create Traefik configuration files."""
@@ -357,48 +583,69 @@ WantedBy=multi-user.target"""
 
     def _update_traefik_config(self, config, ports):
         """Update Traefik configuration with new ports."""
-        for port in ports:
-            entry_point_name = f"port_{port}"
-            if "entryPoints" not in config:
-                config["entryPoints"] = {}
-            config["entryPoints"][entry_point_name] = {
-                "address": f"0.0.0.0:{port}"
-            }
+        # Configs written before /ping was enabled pick it up on the next install
+        config.setdefault("ping", {})
+        config.setdefault("entryPoints", {}).update({
+            f"port_{port}": {"address": f"0.0.0.0:{port}"}
+            for port in ports
+        })
 
     def _update_dynamic_config(self, config, ip_backend, ports):
         """Update dynamic configuration with backend IP and ports."""
-        for port in ports:
-            router_name = f"tcp_router_{port}"
-            service_name = f"tcp_service_{port}"
-
-            config["tcp"]["routers"][router_name] = {
+        # IPv6 literals must be bracketed in host:port addresses
+        backend_host = f"[{ip_backend}]" if ":" in ip_backend else ip_backend
+        tcp = config.setdefault("tcp", {})
+        tcp.setdefault("routers", {}).update({
+            f"tcp_router_{port}": {
                 "entryPoints": [f"port_{port}"],
-                "service": service_name,
+                "service": f"tcp_service_{port}",
                 "rule": "HostSNI(`*`)"
             }
-
-            config["tcp"]["services"][service_name] = {
+            for port in ports
+        })
+        tcp.setdefault("services", {}).update({
+            f"tcp_service_{port}": {
                 "loadBalancer": {
-                    "servers": [{"address": f"{ip_backend}:{port}"}]
+                    "servers": [{"address": f"{backend_host}:{port}"}]
                 }
             }
+            for port in ports
+        })
 
     def _load_config(self, filename):
-        """Load a YAML configuration file."""
+        """Load a YAML configuration file, reusing the last parse if the file is unchanged."""
+        import yaml
         try:
-            if os.path.exists(filename):
-                with open(filename, 'r') as f:
-                    return yaml.safe_load(f)
+            st = os.stat(filename)
+            cached = _YAML_CACHE.get(filename)
+            if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+                return copy.deepcopy(cached[2])
+
+            with open(filename, 'r') as f:
+                config = yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+            _YAML_CACHE[filename] = (st.st_mtime_ns, st.st_size, config)
+            return copy.deepcopy(config)
+        except FileNotFoundError:
+            pass
         except Exception as e:
-            print(termcolor.colored(f"Error loading config {filename}: {str(e)}", "red"))
+            print(colored(f"Error loading config {filename}: {str(e)}", "red"))
         return None
 
     def _save_config(self, filename, config):
-        """Save a YAML configuration file."""
+        """Save a YAML configuration file, skipping the write if nothing changed.
+
+        Returns True if the file was written, False if it already held the same content.
+        """
+        import yaml
         try:
+            data = yaml.dump(config, Dumper=getattr(yaml, "CSafeDumper", yaml.SafeDumper),
+                             default_flow_style=False, sort_keys=False, allow_unicode=True)
             os.makedirs(os.path.dirname(filename), exist_ok=True)
-            with open(filename, 'w') as f:
-                yaml.dump(config, f, default_flow_style=False)
+            written = write_if_changed(filename, data)
+            # The saved dict is what the file now parses to, so the next load is a copy
+            st = os.stat(filename)
+            _YAML_CACHE[filename] = (st.st_mtime_ns, st.st_size, copy.deepcopy(config))
+            return written
         except Exception as e:
             raise Exception(f"Failed to save config {filename}: {str(e)}")
 
@@ -406,13 +653,7 @@ WantedBy=multi-user.target"""
         """Get detailed status of all configured tunnels."""
         try:
             # First check if service is running
-            service_status = subprocess.run(
-                ["systemctl", "is-active", "traefik-tunnel.service"],
-                capture_output=True,
-                text=True
-            ).stdout.strip()
-
-            if service_status != "active":
+            if not self._is_service_active():
                 return {
                     "status": "error",
                     "message": "Traefik service is not running",
@@ -426,12 +667,9 @@ WantedBy=multi-user.target"""
             api_status = self._get_api_status()
             
             # Merge config and API status
+            api_by_port = {t["port"]: t for t in api_status.get("active_tunnels", [])}
             for tunnel in tunnels:
-                api_tunnel = next(
-                    (t for t in api_status.get("active_tunnels", []) 
-                     if t["port"] == tunnel["port"]), 
-                    None
-                )
+                api_tunnel = api_by_port.get(tunnel["port"])
                 if api_tunnel:
                     tunnel.update(api_tunnel)
                 else:
@@ -467,57 +705,43 @@ WantedBy=multi-user.target"""
             # Match ports with their backend services
             for entry_name, entry_data in entrypoints.items():
                 if entry_name.startswith("port_"):
-                    port = entry_name.replace("port_", "")
-                    service_name = f"tcp_service_{port}"
+                    # Slice rather than replace() so only the leading prefix is removed
+                    port = entry_name[len("port_"):]
+                    # Get backend information in a single lookup chain
+                    servers = (tcp_services.get("tcp_service_" + port, {})
+                               .get("loadBalancer", {}).get("servers") or [{}])
                     
-                    tunnel = {
+                    tunnels.append({
                         "port": port,
                         "local_address": entry_data.get("address", "unknown"),
-                        "backend": "unknown",
+                        "backend": servers[0].get("address", "unknown"),
                         "status": "unknown"
-                    }
-                    
-                    # Get backend information
-                    if service_name in tcp_services:
-                        servers = tcp_services[service_name].get("loadBalancer", {}).get("servers", [])
-                        if servers:
-                            tunnel["backend"] = servers[0].get("address", "unknown")
-                    
-                    tunnels.append(tunnel)
+                    })
                     
             return tunnels
         except Exception as e:
-            print(termcolor.colored(f"Error reading config: {str(e)}", "red"))
+            print(colored(f"Error reading config: {str(e)}", "red"))
             return []
 
     def _get_api_status(self):
         """Get status information from Traefik API."""
-        api_urls = [
-            f"http://127.0.0.1:{self.api_port}/api/tcp/routers",
-            f"http://localhost:{self.api_port}/api/tcp/routers",
-            f"http://0.0.0.0:{self.api_port}/api/tcp/routers"
-        ]
-        
-        for url in api_urls:
-            try:
-                response = requests.get(url, timeout=5)
-                if response.status_code == 200:
-                    active_tunnels = []
-                    routers_data = response.json()
-                    
-                    for router in routers_data:
-                        if "tcp" in router.get("service", ""):
-                            port = router["service"].split("_")[-1]
-                            active_tunnels.append({
-                                "port": port,
-                                "status": "active" if router.get("status") == "enabled" else "inactive",
-                                "rule": router.get("rule", "unknown"),
-                                "service": router.get("service")
-                            })
-                    
-                    return {"active_tunnels": active_tunnels}
-            except:
-                continue
+        try:
+            response = self._get_session().get(self._routers_url, timeout=5)
+            if response.status_code == 200:
+                routers = ((router, router.get("service") or "") for router in json_loads(response.content))
+                # Service names come back as "tcp_service_<port>@<provider>"
+                active_tunnels = [
+                    {
+                        "port": service.rsplit("_", 1)[-1].split("@", 1)[0],
+                        "status": "active" if router.get("status") == "enabled" else "inactive",
+                        "rule": router.get("rule", "unknown"),
+                        "service": service
+                    }
+                    for router, service in routers if "tcp" in service
+                ]
+                return {"active_tunnels": active_tunnels}
+        except Exception:
+            pass
         
         return {"active_tunnels": []}
 
@@ -531,58 +755,84 @@ WantedBy=multi-user.target"""
         if not tunnels:
             output.append("  No active tunnels found")
         else:
-            for tunnel in tunnels:
-                output.append(f"\n  Port: {tunnel.get('port', 'unknown')}")
-                output.append(f"  Status: {tunnel.get('status', 'unknown')}")
-                output.append(f"  Backend: {tunnel.get('backend', 'unknown')}")
-                output.append(f"  Local Address: {tunnel.get('local_address', 'unknown')}")
-                output.append("")
+            output.extend(self._TUNNEL_TMPL.format_map({**self._TUNNEL_DEFAULTS, **tunnel}) for tunnel in tunnels)
         
         return "\n".join(output)
 
+def handle_install(manager):
+    # install <api_port> <ip_version> <backend_ip> <ports> skips the prompts
+    if len(sys.argv) > 5:
+        version, ip, ports_input = (arg.strip() for arg in sys.argv[3:6])
+    elif len(sys.argv) > 3:
+        # A partial argument list is almost certainly a script; don't hang it on input()
+        print(colored("install needs all of <ip_version> <backend_ip> <ports> or none of them", "red"))
+        print(USAGE)
+        sys.exit(1)
+    else:
+        version = input("Enter IP version (4/6): ").strip()
+        ip = input("Enter backend IP: ").strip()
+        ports_input = input("Enter ports (comma-separated): ").strip()
+    ports = [port.strip() for port in ports_input.split(',') if port.strip()]
+    manager.install_tunnel(version, ip, ports)
+
+def handle_delete(manager):
+    ports_input = input("\nEnter the ports to delete (comma-separated): ").strip()
+    ports_to_delete = [port.strip() for port in ports_input.split(',') if port.strip()]
+    manager.delete_tunnel(ports_to_delete)
+
+def handle_status(manager):
+    status = manager.get_status()
+    if status.get("status") == "error":
+        print(colored(f"\nError: {status.get('message', 'Unknown error')}", "red"))
+    else:
+        print(colored(manager._format_status_output(status), "green"))
+
+def handle_monitor(manager):
+    try:
+        manager.start_monitoring()
+        # Park until a signal arrives; the manager's SIGINT/SIGTERM handlers stop it
+        while True:
+            if hasattr(signal, "pause"):
+                signal.pause()
+            else:
+                threading.Event().wait()
+    except KeyboardInterrupt:
+        manager.stop_monitoring()
+
+def handle_uninstall(manager):
+    if input("\nAre you sure you want to uninstall? This will remove all configurations. (y/N): ").lower() == 'y':
+        manager.uninstall()
+
+COMMANDS = {
+    "install": handle_install,
+    "delete": handle_delete,
+    "status": handle_status,
+    "monitor": handle_monitor,
+    "uninstall": handle_uninstall,
+}
+
+USAGE = ("Usage: install.py <command> [api_port]\n"
+         "       install.py install <api_port> <ip_version> <backend_ip> <ports>  "
+         "(ports comma-separated; skips the prompts)")
+
 def main():
     # Get API port from command line arguments
     api_port = int(sys.argv[2]) if len(sys.argv) > 2 else 8081
 
     if len(sys.argv) > 1:
         command = sys.argv[1].lower()
-        manager = TunnelManager(api_port)
-        
-        if command == "install":
-            version = input("Enter IP version (4/6): ").strip()
-            ip = input("Enter backend IP: ").strip()
-            ports = input("Enter ports (comma-separated): ").strip().split(',')
-            manager.install_tunnel(version, ip, ports)
-            
-        elif command == "delete":
-            ports_input = input("\nEnter the ports to delete (comma-separated): ").strip()
-            ports_to_delete = [port.strip() for port in ports_input.split(',') if port.strip()]
-            manager.delete_tunnel(ports_to_delete)
-            
-        elif command == "status":
-            status = manager.get_status()
-            if status.get("status") == "error":
-                print(termcolor.colored(f"\nError: {status.get('message', 'Unknown error')}", "red"))
-            else:
-                print(termcolor.colored(manager._format_status_output(status), "green"))
-            
-        elif command == "monitor":
-            try:
-                manager.start_monitoring()
-                while True:
-                    time.sleep(1)
-            except KeyboardInterrupt:
-                manager.stop_monitoring()
-                
-        elif command == "uninstall":
-            if input("\nAre you sure you want to uninstall? This will remove all configurations. (y/N): ").lower() == 'y':
-                manager.uninstall()
-        else:
-            print(termcolor.colored(f"Unknown command: {command}", "red"))
-            print("Available commands: install, delete, status, monitor, uninstall")
+        handler = COMMANDS.get(command)
+        if handler is None:
+            print(colored(f"Unknown command: {command}", "red"))
+            print(f"Available commands: {', '.join(COMMANDS)}")
+            print(USAGE)
+            return
+
+        handler(TunnelManager(api_port))
     else:
-        print(termcolor.colored("No command provided", "red"))
-        print("Available commands: install, delete, status, monitor, uninstall")
+        print(colored("No command provided", "red"))
+        print(f"Available commands: {', '.join(COMMANDS)}")
+        print(USAGE)
 
 if __name__ == "__main__":
     check_and_install_modules()
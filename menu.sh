@@ -142,7 +142,7 @@ setup_venv() {
     python3 -m pip install --upgrade pip
     
     echo -e "${BLUE}Installing required Python packages...${NC}"
-    pip install termcolor requests pyyaml tqdm
+    pip install requests pyyaml tqdm
 }
 
 # Check if Python script exists